@@ -12,7 +12,7 @@ class AncestryTreeGenerator:
         with open(self.system_prompt_path, "r") as f:
             self.system_prompt = f.read().strip()
 
-    async def generate_tree(self, query: str, papers_by_year: Dict[str, Any]) -> Dict[str, Any]:
+    async def generate_tree(self, client: httpx.AsyncClient, query: str, papers_by_year: Dict[str, Any]) -> Dict[str, Any]:
         """
         Calls the OpenRouter API to generate a scientific ancestry tree.
         """
@@ -42,18 +42,18 @@ class AncestryTreeGenerator:
         }
 
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    self.base_url,
-                    json=payload,
-                    headers=headers,
-                )
-                response.raise_for_status()
-                result = response.json()
-                
-                # Parse the content from the LLM response
-                content = result["choices"][0]["message"]["content"]
-                return json.loads(content)
+            response = await client.post(
+                self.base_url,
+                json=payload,
+                headers=headers,
+                timeout=5.0,
+            )
+            response.raise_for_status()
+            result = response.json()
+            
+            # Parse the content from the LLM response
+            content = result["choices"][0]["message"]["content"]
+            return json.loads(content)
 
         except httpx.HTTPStatusError as e:
             error_detail = e.response.text
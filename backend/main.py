@@ -1,13 +1,32 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from backend.routes import router as paper_router
 import os
+import httpx
 from dotenv import load_dotenv
 
 # Load environment variables from .env
 load_dotenv()
 
-app = FastAPI(title="Ancestry Paper Search API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled client for all outbound calls so connections (and their
+    # TLS sessions) are reused across requests instead of re-handshaking.
+    # HTTP/2 multiplexes concurrent requests over a single connection.
+    app.state.http = httpx.AsyncClient(
+        http2=True,
+        timeout=30.0,
+        limits=httpx.Limits(max_keepalive_connections=100, max_connections=100),
+    )
+    try:
+        yield
+    finally:
+        await app.state.http.aclose()
+
+
+app = FastAPI(title="Ancestry Paper Search API", lifespan=lifespan)
 
 # Enable CORS for local development (standard for React frontend)
 app.add_middleware(
@@ -24,4 +43,13 @@ app.include_router(paper_router, prefix="/api", tags=["papers"])
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=1026)
+    workers = os.getenv("WORKERS")
+    # uvicorn's "auto" loop/http pick uvloop and httptools when installed
+    uvicorn.run(
+        "backend.main:app",
+        host="0.0.0.0",
+        port=1026,
+        workers=int(workers) if workers else (os.cpu_count() or 1) * 2 + 1,
+        loop="auto",
+        http="auto",
+    )
@@ -1,8 +1,12 @@
+import asyncio
 import os
-import math
+from dataclasses import dataclass
 from datetime import datetime
-from fastapi import APIRouter, HTTPException, Query
+from typing import Any, Dict
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 import httpx
+import numpy as np
+from cachetools import TTLCache
 from dotenv import load_dotenv
 
 from backend.ai_utils import AncestryTreeGenerator
@@ -20,76 +24,121 @@ SEMANTIC_SCHOLAR_BULK_SEARCH_URL = (
 # Initialize AI components once
 tree_generator = AncestryTreeGenerator()
 
+# Completed /search responses, and runs still in progress, keyed by query
+search_cache = TTLCache(maxsize=512, ttl=300)
+inflight_searches: Dict[str, asyncio.Task] = {}
+_MISSING = object()
 
-def calculate_hybrid_score(paper: dict) -> float:
+
+def get_http_client(request: Request) -> httpx.AsyncClient:
+    """Returns the shared HTTP client created in the app lifespan."""
+    return request.app.state.http
+
+
+@dataclass
+class PaperTable:
+    """
+    Columnar view of a deduplicated paper list used for ranking.
+    Scoring reads the arrays; raw keeps the original dicts for the final output.
+    """
+
+    citations: np.ndarray
+    years: np.ndarray
+    raw: list
+
+    @classmethod
+    def from_papers(cls, papers: list) -> "PaperTable":
+        """
+        Builds the table from Semantic Scholar results.
+        Handles deduplication based on paperId.
+        """
+        # First occurrence of each paperId wins, matching result order
+        unique = {}
+        for paper in papers:
+            paper_id = paper.get("paperId")
+            if paper_id:
+                unique.setdefault(paper_id, paper)
+        unique_papers = list(unique.values())
+
+        citations = np.fromiter(
+            (p.get("citationCount") or 0 for p in unique_papers),
+            dtype=np.float64,
+            count=len(unique_papers),
+        )
+        years = np.fromiter(
+            (p.get("year") or 0 for p in unique_papers),
+            dtype=np.int32,
+            count=len(unique_papers),
+        )
+        return cls(citations=citations, years=years, raw=unique_papers)
+
+    def __len__(self) -> int:
+        return len(self.raw)
+
+
+def calculate_hybrid_scores(table: PaperTable, current_year: int) -> np.ndarray:
     """
-    Computes a hybrid TreeScorer as a weighted combination of raw values.
+    Computes a hybrid TreeScorer for every paper in a single vectorized pass.
 
     Formula:
     Score = (0.5 * Historical) + (0.5 * Momentum)
 
     - Historical: log10(Total Citations + 1)
     - Momentum: Total Citations / (Current Year - Published Year + 1)
-    """
-
-    total_citations = paper.get("citationCount", 0) or 0
-    published_year = paper.get("year")
-    current_year = datetime.now().year
 
-    if published_year is None:
-        return 0.0
+    Papers without a published year score 0.0.
+    """
 
     # 1. Historical Weight (Raw log10)
-    historical_raw = math.log10(total_citations + 1)
+    historical_raw = np.log10(table.citations + 1)
 
     # 2. Momentum Weight (Raw citations/year)
-    years_active = (current_year - published_year) + 1
-    momentum_raw = total_citations / years_active
+    years_active = (current_year - table.years) + 1
+    momentum_raw = table.citations / years_active
 
     # TreeScorer Formula (Balanced Linear Combination)
     tree_scorer = (0.5 * historical_raw) + (0.5 * momentum_raw)
 
-    return tree_scorer
+    return np.where(table.years != 0, tree_scorer, 0.0)
 
 
 def filter_papers(papers: list) -> list:
     """
     Calculates hybrid score (TreeScorer) for all papers and returns the top 30
     highest scoring papers across all years.
-    Handles deduplication based on paperId.
     """
-    seen_ids = set()
-    unique_papers = []
-
-    for paper in papers:
-        paper_id = paper.get("paperId")
-        if paper_id and paper_id not in seen_ids:
-            seen_ids.add(paper_id)
-            unique_papers.append(paper)
+    table = PaperTable.from_papers(papers)
 
-    if not unique_papers:
+    if not len(table):
         return []
 
-    # Calculate the hybrid score for each paper
-    for paper in unique_papers:
-        paper["hybrid_score"] = calculate_hybrid_score(paper)
-
-    # Sort all papers by hybrid score descending
-    sorted_papers = sorted(
-        unique_papers, key=lambda x: x.get("hybrid_score", 0.0), reverse=True
-    )
+    current_year = datetime.now().year
+    scores = calculate_hybrid_scores(table, current_year)
+
+    # Select the top 30 in O(n), then sort only those by score descending.
+    # Ties at the cutoff keep the earliest papers, like a stable sort would.
+    top_idx = np.arange(len(scores))
+    if len(scores) > 30:
+        cutoff = -np.partition(-scores, 29)[29]
+        above = np.flatnonzero(scores > cutoff)
+        ties = np.flatnonzero(scores == cutoff)[: 30 - len(above)]
+        top_idx = np.sort(np.concatenate([above, ties]))
+    top_idx = top_idx[np.argsort(-scores[top_idx], kind="stable")]
+
+    # Only the selected rows are dereferenced back to their dicts
+    top_papers = []
+    for i in top_idx:
+        paper = table.raw[i]
+        paper["hybrid_score"] = float(scores[i])
+        top_papers.append(paper)
 
     # Return the 30 most relevant papers
-    return sorted_papers[:30]
+    return top_papers
 
 
-@router.get("/search")
-async def search_papers(
-    query: str = Query(..., description="The search query for papers"),
-):
+async def build_search_response(query: str, client: httpx.AsyncClient):
     """
-    Search for papers using the Semantic Scholar Bulk Search API.
-    The top 30 papers by TreeScorer (Historical + Momentum) are returned and grouped by year.
+    Runs the full search pipeline (fetch, TreeScorer, AI tree) for a query.
     """
 
     headers = {}
@@ -103,65 +152,64 @@ async def search_papers(
     }
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                SEMANTIC_SCHOLAR_BULK_SEARCH_URL,
-                params=params,
-                headers=headers,
-                timeout=10.0,
-            )
-            response.raise_for_status()
-            data = response.json()
-
-            papers = data.get("data", [])
-
-            # Step 1: Score with TreeScorer and pick top 30
-            top_30_papers = filter_papers(papers)
-
-            # Step 3: Group and format by year for discretization
-            final_data = {}
-            for paper in top_30_papers:
-                year_val = paper.get("year", "Unknown")
-                year_key = str(year_val)
-
-                if year_key not in final_data:
-                    final_data[year_key] = []
-
-                # Format to the new schema: {id, year, name, link, abstract, authors, score}
-                full_abstract = paper.get("abstract") or ""
-                authors_list = paper.get("authors", [])
-                if authors_list and isinstance(authors_list, list):
-                    authors_str = ", ".join(
-                        [a.get("name") for a in authors_list[:3]]
-                    ) + ("..." if len(authors_list) > 3 else "")
-                else:
-                    authors_str = "Various Authors"
-
-                formatted_paper = {
-                    "id": paper.get("paperId"),
-                    "year": year_val,
-                    "name": paper.get("title"),
-                    "link": (paper.get("openAccessPdf") or {}).get("url")
-                    if paper.get("openAccessPdf")
-                    else None,
-                    "abstract": full_abstract[:500]
-                    + ("..." if len(full_abstract) > 500 else ""),
-                    "authors": authors_str,
-                    "score": paper.get("hybrid_score"),
-                }
-                final_data[year_key].append(formatted_paper)
-
-            # Sort the final dictionary by year descending
-            sorted_years = sorted(final_data.keys(), reverse=True)
-            sorted_final_data = {year: final_data[year] for year in sorted_years}
-
-            # Step 4: Call AI to generate the ancestry tree
-            # This uses the system prompt from prompts/system_prompt.txt
-            ai_tree_result = await tree_generator.generate_tree(
-                query, sorted_final_data
-            )
-
-            return ai_tree_result.get("output")
+        response = await client.get(
+            SEMANTIC_SCHOLAR_BULK_SEARCH_URL,
+            params=params,
+            headers=headers,
+            timeout=10.0,
+        )
+        response.raise_for_status()
+        data = response.json()
+
+        papers = data.get("data", [])
+
+        # Step 1: Score with TreeScorer and pick top 30
+        top_30_papers = filter_papers(papers)
+
+        # Step 3: Group and format by year for discretization
+        final_data = {}
+        for paper in top_30_papers:
+            year_val = paper.get("year", "Unknown")
+            year_key = str(year_val)
+
+            if year_key not in final_data:
+                final_data[year_key] = []
+
+            # Format to the new schema: {id, year, name, link, abstract, authors, score}
+            full_abstract = paper.get("abstract") or ""
+            authors_list = paper.get("authors", [])
+            if authors_list and isinstance(authors_list, list):
+                authors_str = ", ".join(
+                    [a.get("name") for a in authors_list[:3]]
+                ) + ("..." if len(authors_list) > 3 else "")
+            else:
+                authors_str = "Various Authors"
+
+            formatted_paper = {
+                "id": paper.get("paperId"),
+                "year": year_val,
+                "name": paper.get("title"),
+                "link": (paper.get("openAccessPdf") or {}).get("url")
+                if paper.get("openAccessPdf")
+                else None,
+                "abstract": full_abstract[:500]
+                + ("..." if len(full_abstract) > 500 else ""),
+                "authors": authors_str,
+                "score": paper.get("hybrid_score"),
+            }
+            final_data[year_key].append(formatted_paper)
+
+        # Sort the final dictionary by year descending
+        sorted_years = sorted(final_data.keys(), reverse=True)
+        sorted_final_data = {year: final_data[year] for year in sorted_years}
+
+        # Step 4: Call AI to generate the ancestry tree
+        # This uses the system prompt from prompts/system_prompt.txt
+        ai_tree_result = await tree_generator.generate_tree(
+            client, query, sorted_final_data
+        )
+
+        return ai_tree_result.get("output")
 
     except httpx.HTTPStatusError as e:
         raise HTTPException(
@@ -172,3 +220,43 @@ async def search_papers(
         raise HTTPException(
             status_code=500, detail=f"An unexpected error occurred: {str(e)}"
         )
+
+
+def finish_search(query: str, task: asyncio.Task) -> None:
+    """
+    Done-callback for a search run: caches successful results and retrieves
+    failures so they aren't logged as unhandled when no request is waiting.
+    A None result means the LLM reply had no "output", so it isn't cached.
+    """
+    inflight_searches.pop(query, None)
+
+    if task.cancelled() or task.exception() is not None:
+        return
+
+    if task.result() is not None:
+        search_cache[query] = task.result()
+
+
+@router.get("/search")
+async def search_papers(
+    query: str = Query(..., description="The search query for papers"),
+    client: httpx.AsyncClient = Depends(get_http_client),
+) -> Any:
+    """
+    Search for papers using the Semantic Scholar Bulk Search API.
+    The top 30 papers by TreeScorer (Historical + Momentum) are returned and grouped by year.
+    Responses are cached per query, and concurrent misses share a single run.
+    """
+    # Single lookup: separate "in" and "[]" calls can straddle a TTL expiry
+    cached = search_cache.get(query, _MISSING)
+    if cached is not _MISSING:
+        return cached
+
+    task = inflight_searches.get(query)
+    if task is None:
+        task = asyncio.create_task(build_search_response(query, client))
+        inflight_searches[query] = task
+        task.add_done_callback(lambda t: finish_search(query, t))
+
+    # Shield so one client disconnecting doesn't cancel the run for the others
+    return await asyncio.shield(task)